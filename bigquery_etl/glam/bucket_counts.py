@@ -5,15 +5,13 @@ python3 -m bigquery_etl.glam.bucket_counts
 ```
 """
 from argparse import ArgumentParser
-from jinja2 import Environment, PackageLoader
 
-from bigquery_etl.format_sql.formatter import reformat
+from bigquery_etl.glam.utils import get_template, reformat
 
 
 def render_query(**kwargs) -> str:
     """Render the main query."""
-    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
-    sql = env.get_template("bucket_counts_v1.sql")
+    sql = get_template("bucket_counts_v1.sql")
     return reformat(sql.render(**kwargs))
 
 
@@ -1,90 +1,143 @@
 #!/usr/bin/env python3
 """clients_daily_scalar_aggregates query generator."""
 import argparse
+import copy
 import json
+import os
 import subprocess
-from typing import Dict, List
-from jinja2 import Environment, PackageLoader
-
-from bigquery_etl.format_sql.formatter import reformat
-
-ATTRIBUTES = ",".join(
-    [
-        "client_id",
-        "ping_type",
-        "submission_date",
-        "os",
-        "app_version",
-        "app_build_id",
-        "channel",
-    ]
+import sys
+import tempfile
+import time
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, List, Sequence, Tuple
+
+from bigquery_etl.glam.utils import get_template, reformat
+
+ATTRIBUTES = (
+    "client_id",
+    "ping_type",
+    "submission_date",
+    "os",
+    "app_version",
+    "app_build_id",
+    "channel",
 )
 
+SCALAR_METRIC_TYPES = {
+    "unlabeled": frozenset(["boolean", "counter", "quantity"]),
+    "labeled": frozenset(["labeled_counter"]),
+}
+
+SCHEMA_CACHE_DIR = os.path.expanduser("~/.cache/bigquery-etl/schemas")
+SCHEMA_CACHE_TTL = 24 * 60 * 60
+
+# Format strings for the metric structs, filled in per probe
+LABELED_METRIC_STRUCT = "('{probe}', '{metric_type}', metrics.{metric_type}.{probe})"
+BOOLEAN_METRIC_STRUCTS = (
+    "('{probe}', 'boolean', '', 'false', "
+    "SUM(CAST(NOT metrics.boolean.{probe} AS INT64)))",
+    "('{probe}', 'boolean', '', 'true', "
+    "SUM(CAST(metrics.boolean.{probe} AS INT64)))",
+)
+SCALAR_METRIC_STRUCTS = tuple(
+    f"('{{probe}}', '{{metric_type}}', '', '{agg_func}', "
+    f"{agg_func}(CAST(metrics.{{metric_type}}.{{probe}} AS INT64)))"
+    for agg_func in ["max", "avg", "min", "sum"]
+) + (
+    "('{probe}', '{metric_type}', '', 'count', "
+    "IF(MIN(metrics.{metric_type}.{probe}) IS NULL, NULL, COUNT(*)))",
+)
 
-def render_main(**kwargs):
+
+def render_main(attributes: Sequence[str], format: bool = True, **kwargs) -> str:
     """Create a SQL query for the clients_daily_scalar_aggregates dataset."""
-    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
-    main_sql = env.get_template("clients_daily_scalar_aggregates_v1.sql")
-    return reformat(main_sql.render(**kwargs))
+    return _render_main(tuple(attributes), format, **kwargs)
+
+
+@lru_cache(maxsize=64)
+def _render_main(attributes: Tuple[str, ...], format: bool, **kwargs) -> str:
+    """Render the main query, memoized on the attributes and template variables."""
+    main_sql = get_template("clients_daily_scalar_aggregates_v1.sql")
+    query = main_sql.render(attributes=attributes, **kwargs)
+    return reformat(query) if format else query
 
 
 def get_labeled_metrics_sql(
     probes: Dict[str, List[str]], value_type: str = "INT64"
 ) -> str:
     """Get the SQL for labeled scalar metrics."""
-    probes_struct = []
-    for metric_type, probes in probes.items():
-        for probe in probes:
-            probes_struct.append(
-                f"('{probe}', '{metric_type}', metrics.{metric_type}.{probe})"
-            )
-
-    probes_struct.sort()
-    probes_arr = ",\n".join(probes_struct)
-    return probes_arr
+    probes_struct = sorted(
+        LABELED_METRIC_STRUCT.format(probe=probe, metric_type=metric_type)
+        for metric_type, names in probes.items()
+        for probe in names
+    )
+    return ",\n".join(probes_struct)
 
 
 def get_unlabeled_metrics_sql(probes: Dict[str, List[str]]) -> str:
     """Put together the subsets of SQL required to query scalars or booleans."""
-    probe_structs = []
-    for probe in probes.pop("boolean", []):
-        probe_structs.append(
-            (
-                f"('{probe}', 'boolean', '', 'false', "
-                f"SUM(CAST(NOT metrics.boolean.{probe} AS INT64)))"
-            )
-        )
-        probe_structs.append(
-            (
-                f"('{probe}', 'boolean', '', 'true', "
-                f"SUM(CAST(metrics.boolean.{probe} AS INT64)))"
-            )
-        )
-
-    for metric_type, probes in probes.items():
-        for probe in probes:
-            for agg_func in ["max", "avg", "min", "sum"]:
-                probe_structs.append(
-                    (
-                        f"('{probe}', '{metric_type}', '', '{agg_func}', "
-                        f"{agg_func}(CAST(metrics.{metric_type}.{probe} AS INT64)))"
-                    )
-                )
-            probe_structs.append(
-                f"('{probe}', '{metric_type}', '', 'count', "
-                f"IF(MIN(metrics.{metric_type}.{probe}) IS NULL, NULL, COUNT(*)))"
-            )
-
-    probe_structs.sort()
-    probes_arr = ",\n".join(probe_structs)
-    return probes_arr
-
-
-def get_schema(table: str, project: str = "moz-fx-data-shared-prod"):
+    booleans = probes.pop("boolean", [])
+    boolean_structs = (
+        struct.format(probe=probe)
+        for probe in booleans
+        for struct in BOOLEAN_METRIC_STRUCTS
+    )
+    scalar_structs = (
+        struct.format(probe=probe, metric_type=metric_type)
+        for metric_type, names in probes.items()
+        for probe in names
+        for struct in SCALAR_METRIC_STRUCTS
+    )
+    return ",\n".join(sorted(chain(boolean_structs, scalar_structs)))
+
+
+def _read_schema_cache(path: str):
+    """Return the cached schema at path, or None if it is stale or unreadable."""
+    try:
+        if time.time() - os.path.getmtime(path) >= SCHEMA_CACHE_TTL:
+            return None
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_schema_cache(path: str, data: bytes):
+    """Atomically write a schema to the cache, so readers never see partial files."""
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def get_schema(
+    table: str, project: str = "moz-fx-data-shared-prod", cache: bool = False
+):
     """Return the dictionary representation of the BigQuery table schema.
 
-    This returns types in the legacy SQL format.
+    This returns types in the legacy SQL format. When cache is set, the schema
+    is also kept on disk and reused for SCHEMA_CACHE_TTL seconds. Each call
+    returns a copy, so callers may modify the result.
     """
+    return copy.deepcopy(_get_schema(table, project, cache))
+
+
+@lru_cache(maxsize=None)
+def _get_schema(table: str, project: str, cache: bool):
+    """Fetch a table schema, memoized for the lifetime of the process."""
+    cache_path = os.path.join(SCHEMA_CACHE_DIR, f"{project}.{table}.json")
+    if cache:
+        schema = _read_schema_cache(cache_path)
+        if schema is not None:
+            return schema
+
     process = subprocess.Popen(
         ["bq", "show", "--schema", "--format=json", f"{project}:{table}"],
         stdout=subprocess.PIPE,
@@ -95,34 +148,41 @@ def get_schema(table: str, project: str = "moz-fx-data-shared-prod"):
         raise Exception(
             f"Call to bq exited non-zero: {process.returncode}", stdout, stderr
         )
-    return json.loads(stdout)
+    schema = json.loads(stdout)
+    if cache:
+        _write_schema_cache(cache_path, stdout)
+    return schema
+
 
+def get_schema_index(schema: List[Dict]) -> Dict[str, Dict[str, List[str]]]:
+    """Index the names of nested fields in a schema by root field and field.
 
-def get_scalar_metrics(schema: Dict, scalar_type: str) -> Dict[str, List[str]]:
-    """Find all scalar probes in a Glean table.
+    For a Glean table this maps e.g. `metrics` -> `counter` -> [metric names],
+    so lookups don't need to walk the schema again.
+    """
+    return {
+        root_field["name"]: {
+            field["name"]: [nested["name"] for nested in field.get("fields", [])]
+            for field in root_field.get("fields", [])
+        }
+        for root_field in schema
+    }
+
+
+def get_scalar_metrics(
+    schema_index: Dict[str, Dict[str, List[str]]], scalar_type: str
+) -> Dict[str, List[str]]:
+    """Find all scalar probes in an indexed Glean table schema.
 
     Metric types are defined in the Glean documentation found here:
     https://mozilla.github.io/glean/book/user/metrics/index.html
     """
-    assert scalar_type in ("unlabeled", "labeled")
-    metric_type_set = {
-        "unlabeled": ["boolean", "counter", "quantity"],
-        "labeled": ["labeled_counter"],
+    assert scalar_type in SCALAR_METRIC_TYPES
+    metrics = schema_index.get("metrics", {})
+    return {
+        metric_type: list(metrics.get(metric_type, []))
+        for metric_type in sorted(SCALAR_METRIC_TYPES[scalar_type])
     }
-    scalars = {metric_type: [] for metric_type in metric_type_set[scalar_type]}
-
-    # Iterate over every element in the schema under the metrics section and
-    # collect a list of metric names.
-    for root_field in schema:
-        if root_field["name"] != "metrics":
-            continue
-        for metric_field in root_field["fields"]:
-            metric_type = metric_field["name"]
-            if metric_type not in metric_type_set[scalar_type]:
-                continue
-            for field in metric_field["fields"]:
-                scalars[metric_type].append(field["name"])
-    return scalars
 
 
 def main():
@@ -139,6 +199,16 @@ def main():
         help="Name of Glean table",
         default="org_mozilla_fenix_stable.metrics_v1",
     )
+    parser.add_argument(
+        "--schema-cache",
+        action="store_true",
+        help="Reuse a table schema fetched from bq within the last day",
+    )
+    parser.add_argument(
+        "--no-format",
+        action="store_true",
+        help="Skip formatting the query, e.g. while iterating on templates",
+    )
     args = parser.parse_args()
 
     # If set to 1 day, then runs of copy_deduplicate may not be done yet
@@ -152,14 +222,19 @@ def main():
         "bigquery_etl.glam.clients_daily_scalar_aggregates "
         f"--source-table {args.source_table}"
         + (" --no-parameterize" if args.no_parameterize else "")
+        + (" --schema-cache" if args.schema_cache else "")
+        + (" --no-format" if args.no_format else "")
     )
 
-    schema = get_schema(args.source_table)
-    unlabeled_metric_names = get_scalar_metrics(schema, "unlabeled")
-    labeled_metric_names = get_scalar_metrics(schema, "labeled")
+    schema_index = get_schema_index(
+        get_schema(args.source_table, cache=args.schema_cache)
+    )
+    unlabeled_metric_names = get_scalar_metrics(schema_index, "unlabeled")
+    labeled_metric_names = get_scalar_metrics(schema_index, "labeled")
 
-    print(
+    sys.stdout.write(
         render_main(
+            format=not args.no_format,
             header=header,
             source_table=args.source_table,
             submission_date=submission_date,
@@ -168,6 +243,7 @@ def main():
             labeled_metrics=get_labeled_metrics_sql(labeled_metric_names),
         )
     )
+    sys.stdout.write("\n")
 
 
 if __name__ == "__main__":
@@ -1,14 +1,12 @@
 """Find the latest version of a glean ping."""
 from argparse import ArgumentParser
-from jinja2 import Environment, PackageLoader
 
-from bigquery_etl.format_sql.formatter import reformat
+from bigquery_etl.glam.utils import get_template, reformat
 
 
 def render_main(**kwargs,) -> str:
     """Render the main query."""
-    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
-    main_sql = env.get_template("latest_versions_v1.sql")
+    main_sql = get_template("latest_versions_v1.sql")
     return reformat(main_sql.render(**kwargs))
 
 
@@ -8,35 +8,82 @@ diff \
     <(python3 -m bigquery_etl.glam.probe_counts)
 ```
 """
+import sys
 from argparse import ArgumentParser
-from itertools import combinations
-from typing import List
-
-from jinja2 import Environment, PackageLoader
-
-from bigquery_etl.format_sql.formatter import reformat
-
-
-def render_query(attributes: List[str], **kwargs) -> str:
-    """Render the main query."""
-    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
-    sql = env.get_template("probe_counts_v1.sql")
-
-    # If the set of attributes grows, the max_combinations can be set only
-    # compute a shallow set for less query complexity
-    max_combinations = len(attributes)
-    attribute_combinations = []
-    for subset_size in reversed(range(max_combinations + 1)):
-        for grouping in combinations(attributes, subset_size):
-            # channel and app_version are required in the GLAM frontend
-            if "channel" not in grouping or "app_version" not in grouping:
-                continue
-            select_expr = []
-            for attribute in attributes:
-                select_expr.append((attribute, attribute in grouping))
-            attribute_combinations.append(select_expr)
-
-    return reformat(sql.render(attribute_combinations=attribute_combinations, **kwargs))
+from functools import lru_cache
+from typing import Sequence, Tuple
+
+from bigquery_etl.glam.utils import get_template, reformat
+
+# channel and app_version are required in the GLAM frontend
+REQUIRED_ATTRIBUTES = ("channel", "app_version")
+
+
+@lru_cache(maxsize=None)
+def attribute_combinations(attributes: Tuple[str, ...]) -> Tuple[int, ...]:
+    """Return a bitmask for every grouping of attributes used by GLAM.
+
+    Masks read left to right like the attributes: bit len(attributes) - 1 - i
+    is set when attributes[i] is part of the grouping. The groupings are
+    ordered from the most to the least specific, in the order
+    itertools.combinations would produce them for each size. The attribute
+    sets are fixed per ping type, so the result is computed once per process.
+
+    Raises ValueError if attributes lacks any of REQUIRED_ATTRIBUTES.
+    """
+    missing = set(REQUIRED_ATTRIBUTES) - set(attributes)
+    if missing:
+        raise ValueError(f"Missing required attributes: {sorted(missing)}")
+
+    bits = [1 << index for index in reversed(range(len(attributes)))]
+    required_mask = 0
+    optional_mask = 0
+    for attribute, bit in zip(attributes, bits):
+        if attribute in REQUIRED_ATTRIBUTES:
+            required_mask |= bit
+        else:
+            optional_mask |= bit
+
+    # Required attributes are part of every grouping, so only the subsets of
+    # the optional attributes are enumerated, by counting up through the
+    # submasks of optional_mask. Clearing the lowest set bit of a subset gives
+    # a smaller subset that was already visited, which yields its size. This
+    # order is not significant; the output order is established by the sort.
+    sizes = {0: 0}
+    groupings = [(0, required_mask)]
+    subset = 0
+    while True:
+        subset = (subset - optional_mask) & optional_mask
+        if not subset:
+            break
+        size = sizes[subset & (subset - 1)] + 1
+        sizes[subset] = size
+        groupings.append((size, required_mask | subset))
+
+    # If the set of attributes grows, the masks can be limited to a shallow set
+    # of groupings for less query complexity. With the first attribute in the
+    # highest bit, combinations order within a size is descending mask order.
+    return tuple(mask for _, mask in sorted(groupings, reverse=True))
+
+
+def render_query(attributes: Sequence[str], format: bool = True, **kwargs) -> str:
+    """Render the main query.
+
+    Formatting can be skipped with format=False when the output is not kept.
+    """
+    return _render_query(tuple(attributes), format, **kwargs)
+
+
+@lru_cache(maxsize=64)
+def _render_query(attributes: Tuple[str, ...], format: bool, **kwargs) -> str:
+    """Render the main query, memoized on the attributes and template variables."""
+    sql = get_template("probe_counts_v1.sql")
+    query = sql.render(
+        attributes=attributes,
+        attribute_combinations=attribute_combinations(attributes),
+        **kwargs,
+    )
+    return reformat(query) if format else query
 
 
 def telemetry_variables():
@@ -103,16 +150,27 @@ def main():
         choices=["glean", "telemetry"],
         help="determine attributes and user data types to aggregate",
     )
+    parser.add_argument(
+        "--no-format",
+        action="store_true",
+        help="skip formatting the query, e.g. while iterating on templates",
+    )
     args = parser.parse_args()
     module_name = "bigquery_etl.glam.probe_counts"
-    header = f"-- generated by: python3 -m {module_name}"
-    header += " " + " ".join(
-        [f"--{k} {v}" for k, v in vars(args).items() if k != "init"]
+    header_parts = [f"-- generated by: python3 -m {module_name}"]
+    header_parts.extend(
+        f"--{k} {v}" for k, v in vars(args).items() if k not in ("init", "no_format")
     )
+    if args.no_format:
+        header_parts.append("--no-format")
+    header = " ".join(header_parts)
     variables = (
         telemetry_variables() if args.ping_type == "telemetry" else glean_variables()
     )
-    print(render_query(header=header, **variables))
+    sys.stdout.write(
+        render_query(header=header, format=not args.no_format, **variables)
+    )
+    sys.stdout.write("\n")
 
 
 if __name__ == "__main__":
@@ -28,9 +28,7 @@ python -m bigquery_etl.glam.scalar_aggregates_incremental \
 from argparse import ArgumentParser
 from typing import List
 
-from jinja2 import Environment, PackageLoader
-
-from bigquery_etl.format_sql.formatter import reformat
+from bigquery_etl.glam.utils import get_template, reformat
 
 
 def render_main(
@@ -45,8 +43,7 @@ def render_main(
     **kwargs,
 ) -> str:
     """Render the main query."""
-    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
-    main_sql = env.get_template("clients_scalar_aggregates_v1.sql")
+    main_sql = get_template("clients_scalar_aggregates_v1.sql")
     return reformat(
         main_sql.render(
             header=header,
@@ -72,8 +69,7 @@ def render_init(
     **kwargs,
 ) -> str:
     """Render the table initialization DML for partitioning and clustering."""
-    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
-    init_sql = env.get_template("clients_scalar_aggregates_v1.init.sql")
+    init_sql = get_template("clients_scalar_aggregates_v1.init.sql")
     return reformat(
         init_sql.render(
             header=header,
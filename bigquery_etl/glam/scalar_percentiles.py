@@ -3,23 +3,21 @@ from argparse import ArgumentParser
 from itertools import combinations
 from typing import List
 
-from jinja2 import Environment, PackageLoader
-
-from bigquery_etl.format_sql.formatter import reformat
+from bigquery_etl.glam.utils import get_template, reformat
 
 
 def render_query(attributes: List[str], **kwargs) -> str:
     """Render the main query."""
-    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
-    sql = env.get_template("scalar_percentiles_v1.sql")
+    sql = get_template("scalar_percentiles_v1.sql")
 
     max_combinations = len(attributes) + 1
     attribute_combinations = []
     for subset_size in reversed(range(max_combinations)):
         for grouping in combinations(attributes, subset_size):
+            grouped = frozenset(grouping)
             select_expr = []
             for attribute in attributes:
-                select_expr.append((attribute, attribute in grouping))
+                select_expr.append((attribute, attribute in grouped))
             attribute_combinations.append(select_expr)
 
     return reformat(sql.render(attribute_combinations=attribute_combinations, **kwargs))
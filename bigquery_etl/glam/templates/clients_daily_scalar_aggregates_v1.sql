@@ -22,18 +22,18 @@ WITH extracted AS (
 ),
 unlabeled_metrics AS (
   SELECT
-    {{ attributes }},
+    {{ attributes | join(", ") }},
     ARRAY<STRUCT<metric STRING, metric_type STRING, key STRING, agg_type STRING, value FLOAT64>>[
         {{ unlabeled_metrics }}
     ] as scalar_aggregates
   FROM
     extracted
   GROUP BY
-    {{ attributes }}
+    {{ attributes | join(", ") }}
 ),
 grouped_labeled_metrics AS (
   SELECT
-    {{ attributes }},
+    {{ attributes | join(", ") }},
     ARRAY<STRUCT<name STRING, type STRING, value ARRAY<STRUCT<key STRING, value INT64>>>>[
         {{ labeled_metrics }}
     ] as metrics
@@ -42,7 +42,7 @@ grouped_labeled_metrics AS (
 ),
 flattened_labeled_metrics AS (
   SELECT
-    {{ attributes }},
+    {{ attributes | join(", ") }},
     metrics.name AS metric,
     metrics.type AS metric_type,
     value.key AS key,
@@ -55,7 +55,7 @@ flattened_labeled_metrics AS (
 ),
 aggregated_labeled_metrics AS (
   SELECT
-    {{ attributes }},
+    {{ attributes | join(", ") }},
     metric,
     metric_type,
     key,
@@ -67,14 +67,14 @@ aggregated_labeled_metrics AS (
   FROM
     flattened_labeled_metrics
   GROUP BY
-    {{ attributes }},
+    {{ attributes | join(", ") }},
     metric,
     metric_type,
     key
 ),
 labeled_metrics AS (
   SELECT
-    {{ attributes }},
+    {{ attributes | join(", ") }},
     ARRAY_CONCAT_AGG(
         ARRAY<STRUCT<metric STRING, metric_type STRING, key STRING, agg_type STRING, value FLOAT64>>[
         (metric, metric_type, key, 'max', max),
@@ -87,7 +87,7 @@ labeled_metrics AS (
   FROM
     aggregated_labeled_metrics
   GROUP BY
-    {{ attributes }}
+    {{ attributes | join(", ") }}
 )
 SELECT
   *
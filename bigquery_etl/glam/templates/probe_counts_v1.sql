@@ -3,8 +3,8 @@
 
 {% for attribute_combo in attribute_combinations %}
     SELECT
-        {% for attribute, in_grouping in attribute_combo %}
-            {% if in_grouping %}
+        {% for attribute in attributes %}
+            {% if attribute_combo is bit_set(loop.revindex0) %}
                 {{ attribute }},
             {% else %}
                 NULL AS {{ attribute }},
@@ -38,8 +38,10 @@
         os IS NOT NULL
     {% endif %}
     GROUP BY
-        {% for attribute, in_grouping in attribute_combo if in_grouping %}
-            {{ attribute }},
+        {% for attribute in attributes %}
+            {% if attribute_combo is bit_set(loop.revindex0) %}
+                {{ attribute }},
+            {% endif %}
         {% endfor %}
         {{ aggregate_attributes }},
         {{ aggregate_grouping }}
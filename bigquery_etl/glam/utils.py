@@ -0,0 +1,45 @@
+"""Utilities for the GLAM query generators.
+
+Jinja and the SQL formatter are imported on first use, so modules that only
+need schema or metric helpers don't pay for them at import time.
+"""
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+
+def bit_set(mask: int, index: int) -> bool:
+    """Return whether the bit at index is set in mask.
+
+    Registered as the ``bit_set`` test, e.g. ``{% if mask is bit_set(0) %}``.
+    """
+    return bool(mask >> index & 1)
+
+
+@lru_cache(maxsize=1)
+def get_environment() -> "Environment":
+    """Return the Jinja environment for the GLAM templates.
+
+    The environment is created on first use and shared between generators.
+    """
+    from jinja2 import Environment, PackageLoader
+
+    env = Environment(loader=PackageLoader("bigquery_etl", "glam/templates"))
+    env.tests["bit_set"] = bit_set
+    return env
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> "Template":
+    """Return a compiled template, parsing it only once per process."""
+    return get_environment().get_template(name)
+
+
+@lru_cache(maxsize=64)
+def reformat(query: str) -> str:
+    """Reformat a rendered query, memoized on the unformatted query text."""
+    from bigquery_etl.format_sql import formatter
+
+    return formatter.reformat(query)
@@ -0,0 +1,145 @@
+import json
+import os
+import textwrap
+
+import pytest
+
+from bigquery_etl.glam import clients_daily_scalar_aggregates
+from bigquery_etl.glam.clients_daily_scalar_aggregates import (
+    get_labeled_metrics_sql,
+    get_scalar_metrics,
+    get_schema,
+    get_schema_index,
+    get_unlabeled_metrics_sql,
+)
+
+SCHEMA = [{"name": "metrics", "fields": [{"name": "counter", "fields": []}]}]
+
+
+@pytest.fixture
+def fake_bq(tmp_path, monkeypatch):
+    """Put a bq executable on PATH that prints SCHEMA and counts its calls."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    calls = tmp_path / "calls"
+    bq = bin_dir / "bq"
+    bq.write_text(f"#!/bin/sh\necho >> {calls}\necho '{json.dumps(SCHEMA)}'\n")
+    bq.chmod(0o755)
+    cache_dir = tmp_path / "schemas"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(
+        clients_daily_scalar_aggregates, "SCHEMA_CACHE_DIR", str(cache_dir)
+    )
+    clients_daily_scalar_aggregates._get_schema.cache_clear()
+    yield lambda: len(calls.read_text().splitlines()) if calls.exists() else 0
+    clients_daily_scalar_aggregates._get_schema.cache_clear()
+
+
+def test_get_scalar_metrics_without_metrics_root():
+    schema = [{"name": "client_info", "fields": [{"name": "client_id"}]}]
+    index = get_schema_index(schema)
+    assert get_scalar_metrics(index, "unlabeled") == {
+        "boolean": [],
+        "counter": [],
+        "quantity": [],
+    }
+    assert get_scalar_metrics(index, "labeled") == {"labeled_counter": []}
+
+
+def test_get_scalar_metrics_metric_type_without_fields():
+    schema = [
+        {
+            "name": "metrics",
+            "fields": [
+                {"name": "counter"},
+                {"name": "boolean", "fields": [{"name": "is_default"}]},
+            ],
+        }
+    ]
+    index = get_schema_index(schema)
+    assert get_scalar_metrics(index, "unlabeled") == {
+        "boolean": ["is_default"],
+        "counter": [],
+        "quantity": [],
+    }
+
+
+def test_get_scalar_metrics_excludes_other_metric_types():
+    schema = [
+        {"name": "client_info", "fields": [{"name": "client_id"}]},
+        {
+            "name": "metrics",
+            "fields": [
+                {"name": "counter", "fields": [{"name": "a"}, {"name": "b"}]},
+                {"name": "quantity", "fields": [{"name": "c"}]},
+                {"name": "labeled_counter", "fields": [{"name": "d"}]},
+                {"name": "string", "fields": [{"name": "e"}]},
+                {"name": "timing_distribution", "fields": [{"name": "f"}]},
+            ],
+        },
+    ]
+    index = get_schema_index(schema)
+    assert get_scalar_metrics(index, "unlabeled") == {
+        "boolean": [],
+        "counter": ["a", "b"],
+        "quantity": ["c"],
+    }
+    assert get_scalar_metrics(index, "labeled") == {"labeled_counter": ["d"]}
+
+
+def test_get_schema_does_not_cache_on_disk_by_default(fake_bq, tmp_path):
+    assert get_schema("dataset.table") == SCHEMA
+    assert fake_bq() == 1
+    assert not (tmp_path / "schemas").exists()
+
+
+def test_get_schema_returns_a_copy(fake_bq):
+    get_schema("dataset.table")[0]["name"] = "changed"
+    assert get_schema("dataset.table") == SCHEMA
+    assert fake_bq() == 1
+
+
+def test_get_schema_reuses_disk_cache(fake_bq):
+    assert get_schema("dataset.table", cache=True) == SCHEMA
+    clients_daily_scalar_aggregates._get_schema.cache_clear()
+    assert get_schema("dataset.table", cache=True) == SCHEMA
+    assert fake_bq() == 1
+
+
+def test_get_schema_refetches_truncated_cache(fake_bq, tmp_path):
+    cache_dir = tmp_path / "schemas"
+    cache_dir.mkdir()
+    cache_file = cache_dir / "moz-fx-data-shared-prod.dataset.table.json"
+    cache_file.write_text(json.dumps(SCHEMA)[:10])
+    assert get_schema("dataset.table", cache=True) == SCHEMA
+    assert fake_bq() == 1
+    assert json.loads(cache_file.read_text()) == SCHEMA
+    assert os.listdir(cache_dir) == [cache_file.name]
+
+
+def test_get_unlabeled_metrics_sql():
+    probes = {"boolean": ["b"], "counter": ["c", "a"]}
+    assert get_unlabeled_metrics_sql(probes) == textwrap.dedent(
+        """\
+        ('a', 'counter', '', 'avg', avg(CAST(metrics.counter.a AS INT64))),
+        ('a', 'counter', '', 'count', IF(MIN(metrics.counter.a) IS NULL, NULL, COUNT(*))),
+        ('a', 'counter', '', 'max', max(CAST(metrics.counter.a AS INT64))),
+        ('a', 'counter', '', 'min', min(CAST(metrics.counter.a AS INT64))),
+        ('a', 'counter', '', 'sum', sum(CAST(metrics.counter.a AS INT64))),
+        ('b', 'boolean', '', 'false', SUM(CAST(NOT metrics.boolean.b AS INT64))),
+        ('b', 'boolean', '', 'true', SUM(CAST(metrics.boolean.b AS INT64))),
+        ('c', 'counter', '', 'avg', avg(CAST(metrics.counter.c AS INT64))),
+        ('c', 'counter', '', 'count', IF(MIN(metrics.counter.c) IS NULL, NULL, COUNT(*))),
+        ('c', 'counter', '', 'max', max(CAST(metrics.counter.c AS INT64))),
+        ('c', 'counter', '', 'min', min(CAST(metrics.counter.c AS INT64))),
+        ('c', 'counter', '', 'sum', sum(CAST(metrics.counter.c AS INT64)))"""  # noqa: E501
+    )
+
+
+def test_get_labeled_metrics_sql():
+    probes = {"labeled_counter": ["z", "a"]}
+    assert get_labeled_metrics_sql(probes) == textwrap.dedent(
+        """\
+        ('a', 'labeled_counter', metrics.labeled_counter.a),
+        ('z', 'labeled_counter', metrics.labeled_counter.z)"""
+    )
@@ -0,0 +1,76 @@
+from itertools import combinations
+
+import pytest
+
+from bigquery_etl.glam.probe_counts import (
+    attribute_combinations,
+    glean_variables,
+    render_query,
+    telemetry_variables,
+)
+from bigquery_etl.glam.utils import bit_set
+
+
+def expected_combinations(attributes):
+    """Build the groupings the way render_query originally did."""
+    groupings = []
+    for subset_size in reversed(range(len(attributes) + 1)):
+        for grouping in combinations(attributes, subset_size):
+            if "channel" not in grouping or "app_version" not in grouping:
+                continue
+            groupings.append([attribute in grouping for attribute in attributes])
+    return groupings
+
+
+@pytest.mark.parametrize("variables", [telemetry_variables, glean_variables])
+def test_attribute_combinations(variables):
+    attributes = tuple(variables()["attributes"])
+    masks = attribute_combinations(attributes)
+    # the template reads attributes[i] from bit loop.revindex0
+    actual = [
+        [bit_set(mask, len(attributes) - 1 - index) for index in range(len(attributes))]
+        for mask in masks
+    ]
+    assert actual == expected_combinations(attributes)
+
+
+def test_attribute_combinations_requires_channel_and_app_version():
+    with pytest.raises(ValueError):
+        attribute_combinations(("os", "channel"))
+    with pytest.raises(ValueError):
+        attribute_combinations(("os", "app_version"))
+
+
+def grouping_columns(branch):
+    """Return the SELECT and GROUP BY attribute columns of a query branch."""
+    text = " ".join(branch.split())
+    select = text.partition(" metric, metric_type")[0].rpartition("SELECT ")[2]
+    group_by = text.rpartition("GROUP BY ")[2].partition(" metric,")[0]
+    return select, group_by
+
+
+def test_render_query_groupings():
+    query = render_query(header="-- header", format=False, **glean_variables())
+    branches = query.split("UNION ALL")
+    # ping_type, os and app_build_id are optional
+    assert len(branches) == 8
+    assert grouping_columns(branches[0]) == (
+        "ping_type, os, app_version, app_build_id, channel,",
+        "ping_type, os, app_version, app_build_id, channel,",
+    )
+    assert grouping_columns(branches[1]) == (
+        "ping_type, os, app_version, NULL AS app_build_id, channel,",
+        "ping_type, os, app_version, channel,",
+    )
+    assert grouping_columns(branches[-1]) == (
+        "NULL AS ping_type, NULL AS os, app_version, NULL AS app_build_id, channel,",
+        "app_version, channel,",
+    )
+
+
+def test_bit_set():
+    assert bit_set(0b101, 0)
+    assert not bit_set(0b101, 1)
+    assert bit_set(0b101, 2)
+    assert not bit_set(0b101, 3)
+    assert not bit_set(0, 0)